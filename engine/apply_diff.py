@@ -1,18 +1,22 @@
 # engine/apply_diff.py
 from __future__ import annotations
+import copy
 from typing import Dict, Any, List
-from engine.schemas import SpaceUpdate, NpcUpdate, EventProposal, UpdateList, Update
+from engine.schemas import SpaceUpdate, NpcUpdate, EventProposal, UpdateList, Update, FieldChange
 from engine.store import dump_json, append_jsonl
+from engine.change_feed import diff_fields, publish
 
 def _clip_importance(x: int) -> int:
     return max(1, min(3, x))
 
-def apply_space_update(world: Dict[str, Any], upd: SpaceUpdate):
+def apply_space_update(world: Dict[str, Any], upd: SpaceUpdate) -> List[FieldChange]:
+    """应用空间更新，返回字段级变化（before/after）。"""
     sid = upd.space_id
     if sid not in world:
         # 忽略不存在的空间
-        return
+        return []
     space = world[sid]
+    before = copy.deepcopy(space)
     # 可视描述增量：简单拼接，你后面可以改成更精细的策略
     old_vis = space.get("visible_state", "")
     if old_vis:
@@ -35,12 +39,15 @@ def apply_space_update(world: Dict[str, Any], upd: SpaceUpdate):
     # 重要度调整
     imp = space.get("importance", 1)
     space["importance"] = _clip_importance(imp + upd.importance_delta)
+    return diff_fields(before, space)
 
-def apply_npc_update(entities: Dict[str, Any], upd: NpcUpdate):
+def apply_npc_update(entities: Dict[str, Any], upd: NpcUpdate) -> List[FieldChange]:
+    """应用 NPC 更新，返回字段级变化（before/after）。"""
     nid = upd.npc_id
     if nid not in entities:
-        return
+        return []
     npc = entities[nid]
+    before = copy.deepcopy(npc)
     # 合并状态字典
     state_delta = upd.state_delta or {}
     for k, v in state_delta.items():
@@ -57,15 +64,18 @@ def apply_npc_update(entities: Dict[str, Any], upd: NpcUpdate):
     # 重要度调整
     imp = npc.get("importance", 1)
     npc["importance"] = _clip_importance(imp + upd.importance_delta)
+    return diff_fields(before, npc)
 
-def apply_event_proposal(events: List[Dict[str, Any]], upd: EventProposal):
+def apply_event_proposal(events: List[Dict[str, Any]], upd: EventProposal) -> List[FieldChange]:
+    """应用事件提议，返回字段级变化；新事件的 before 均为 None。"""
     # 简单策略：如果有同 id 事件则更新，否则 append
     for ev in events:
         if ev.get("id") == upd.event_id:
+            before = copy.deepcopy(ev)
             ev["scope_spaces"] = upd.scope_spaces or ev.get("scope_spaces", [])
             ev["trigger_probability"] = upd.suggested_probability
             ev["possible_outcomes"] = upd.possible_outcomes or ev.get("possible_outcomes", [])
-            return
+            return diff_fields(before, ev)
     events.append({
         "id": upd.event_id,
         "scope_spaces": upd.scope_spaces,
@@ -73,16 +83,19 @@ def apply_event_proposal(events: List[Dict[str, Any]], upd: EventProposal):
         "possible_outcomes": upd.possible_outcomes,
         "latency": True
     })
+    return diff_fields({}, events[-1])
 
 def apply_updates(world: Dict[str, Any],
                   entities: Dict[str, Any],
                   events: List[Dict[str, Any]],
                   update_list: UpdateList,
                   source: str = "latent_update"):
-    """统一应用一批更新，并写入日志。"""
+    """统一应用一批更新，写入日志，并在落盘后发布到变更流。"""
+    pending = []  # (type, target, target_id, changes)
     for upd in update_list.updates:
         if isinstance(upd, SpaceUpdate):
-            apply_space_update(world, upd)
+            changes = apply_space_update(world, upd)
+            pending.append(("space_update", "world", upd.space_id, changes))
             append_jsonl("data/world_log.jsonl", {
                 "event": source,
                 "type": "space_update",
@@ -91,7 +104,8 @@ def apply_updates(world: Dict[str, Any],
                 "reasons": upd.reasons,
             })
         elif isinstance(upd, NpcUpdate):
-            apply_npc_update(entities, upd)
+            changes = apply_npc_update(entities, upd)
+            pending.append(("npc_update", "entities", upd.npc_id, changes))
             append_jsonl("data/world_log.jsonl", {
                 "event": source,
                 "type": "npc_update",
@@ -101,7 +115,8 @@ def apply_updates(world: Dict[str, Any],
                 "reasons": upd.reasons,
             })
         elif isinstance(upd, EventProposal):
-            apply_event_proposal(events, upd)
+            changes = apply_event_proposal(events, upd)
+            pending.append(("event_proposal", "events", upd.event_id, changes))
             append_jsonl("data/world_log.jsonl", {
                 "event": source,
                 "type": "event_proposal",
@@ -115,3 +130,7 @@ def apply_updates(world: Dict[str, Any],
     dump_json("data/world.json", world)
     dump_json("data/entities.json", entities)
     dump_json("data/events.json", events)
+
+    # 文件写完再发布，保证客户端拿到版本号时磁盘状态已一致
+    for kind, target, target_id, changes in pending:
+        publish(kind, target, target_id, changes, source)
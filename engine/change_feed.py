@@ -0,0 +1,204 @@
+# engine/change_feed.py
+from __future__ import annotations
+import os, time, json
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlparse, parse_qs
+from engine.schemas import FieldChange, ChangeSet
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+CHANGES_PATH = "data/changes.jsonl"
+
+@contextmanager
+def _file_lock(path: str):
+    """
+    跨进程排他锁，锁在旁路文件 <path>.lock 上：POSIX 用 flock，Windows 用 msvcrt，其他平台不加锁。
+    Windows 的锁是强制锁，不锁数据文件本身，以免阻塞读取方。
+    """
+    with open(path + ".lock", "a+b") as lf:
+        if fcntl is not None:
+            fcntl.flock(lf, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lf, fcntl.LOCK_UN)
+        elif msvcrt is not None:
+            lf.seek(0)
+            msvcrt.locking(lf.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                lf.seek(0)
+                msvcrt.locking(lf.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            yield
+
+def diff_fields(before: Dict[str, Any], after: Dict[str, Any]) -> List[FieldChange]:
+    """逐字段比较两个对象，返回有变化的字段（新增字段 before=None，删除字段 after=None）。"""
+    changes: List[FieldChange] = []
+    for k in list(before) + [k for k in after if k not in before]:
+        if before.get(k) != after.get(k):
+            changes.append(FieldChange(field=k, before=before.get(k), after=after.get(k)))
+    return changes
+
+def _last_version(f) -> int:
+    """
+    从 changes.jsonl 末尾倒序找最后一条合法记录的版本号（不扫全文件）。
+    崩溃留下的半行等无法解析的行会被跳过，版本号不会因此回退。
+    """
+    f.seek(0, os.SEEK_END)
+    pos = f.tell()
+    buf = b""
+    while pos > 0:
+        step = min(4096, pos)
+        pos -= step
+        f.seek(pos)
+        buf = f.read(step) + buf
+        lines = buf.split(b"\n")
+        # pos > 0 时首行可能不完整，留到下一轮拼接
+        head, complete = (lines[0], lines[1:]) if pos > 0 else (b"", lines)
+        for line in reversed(complete):
+            if not line.strip():
+                continue
+            try:
+                return int(json.loads(line)["version"])
+            except (json.JSONDecodeError, UnicodeDecodeError, KeyError, TypeError, ValueError):
+                continue
+        buf = head
+    return 0
+
+def _append(kind: str, target: str, target_id: str, changes: List[FieldChange],
+            source: str) -> ChangeSet:
+    """在跨进程文件锁内读取最新版本号并追加一条记录，保证版本号单调递增。"""
+    os.makedirs(os.path.dirname(CHANGES_PATH), exist_ok=True)
+    with _file_lock(CHANGES_PATH), open(CHANGES_PATH, "a+b") as f:
+        cs = ChangeSet(version=_last_version(f) + 1, source=source, type=kind,
+                       target=target, target_id=target_id, changes=changes, ts=time.time())
+        prefix = b""
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                prefix = b"\n"  # 上一行不完整：另起一行，避免拼进坏行
+        f.write(prefix + cs.model_dump_json().encode("utf-8") + b"\n")
+        f.flush()
+    return cs
+
+def publish(kind: str, target: str, target_id: str, changes: List[FieldChange],
+            source: str) -> Optional[ChangeSet]:
+    """为一次已应用的更新分配下一个版本号并追加到变更流；无字段变化时不记录。"""
+    if not changes:
+        return None
+    return _append(kind, target, target_id, changes, source)
+
+def publish_reset(world: Dict[str, Any], entities: Dict[str, Any],
+                  events: List[Dict[str, Any]], source: str = "init") -> ChangeSet:
+    """
+    整体替换世界（如重新 init）后发布一条 reset 快照：
+    客户端遇到 type="reset" 时丢弃本地状态，以 changes 中的 world/entities/events 为新基线。
+    """
+    changes = [FieldChange(field="world", after=world),
+               FieldChange(field="entities", after=entities),
+               FieldChange(field="events", after=events)]
+    return _append("reset", "all", "", changes, source)
+
+def _tail(since: int, follow: bool, poll: float) -> Iterator[Optional[ChangeSet]]:
+    # follow 模式下空闲时 yield None，便于调用方发送心跳
+    while follow and not os.path.exists(CHANGES_PATH):
+        yield None
+        time.sleep(poll)
+    if not os.path.exists(CHANGES_PATH):
+        return
+    with open(CHANGES_PATH, "r", encoding="utf-8") as f:
+        pending = ""
+        while True:
+            line = f.readline()
+            if not line:
+                if not follow:
+                    return
+                yield None
+                time.sleep(poll)
+                continue
+            pending += line
+            if not pending.endswith("\n"):
+                continue  # 写入方尚未写完整行
+            line, pending = pending.strip(), ""
+            if not line:
+                continue
+            try:
+                cs = ChangeSet.model_validate_json(line)
+            except ValueError:
+                continue
+            if cs.version > since:
+                yield cs
+
+def iter_changes(since: int = 0, follow: bool = False, poll: float = 0.5) -> Iterator[ChangeSet]:
+    """
+    进程内订阅：按版本顺序产出 version > since 的变更。
+    follow=True 时持续等待新变更（类似 tail -f）。
+    """
+    for cs in _tail(since, follow, poll):
+        if cs is not None:
+            yield cs
+
+class _SSEHandler(BaseHTTPRequestHandler):
+    poll = 0.5
+    heartbeat = 15.0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/changes":
+            self.send_error(404)
+            return
+        # 断线重连时浏览器会带 Last-Event-ID；显式 ?since= 优先
+        since_raw = parse_qs(url.query).get("since", [self.headers.get("Last-Event-ID", "0")])[0]
+        try:
+            since = int(since_raw)
+        except ValueError:
+            self.send_error(400, "since must be an integer")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "keep-alive")
+        self.end_headers()
+
+        idle_since = time.time()
+        try:
+            for cs in _tail(since, follow=True, poll=self.poll):
+                if cs is None:
+                    if time.time() - idle_since >= self.heartbeat:
+                        self.wfile.write(b": ping\n\n")
+                        self.wfile.flush()
+                        idle_since = time.time()
+                    continue
+                msg = f"id: {cs.version}\nevent: change\ndata: {cs.model_dump_json()}\n\n"
+                self.wfile.write(msg.encode("utf-8"))
+                self.wfile.flush()
+                idle_since = time.time()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_changes(host: str = "127.0.0.1", port: int = 8765):
+    """以 SSE 形式提供变更流：GET /changes?since=<version>。"""
+    server = ThreadingHTTPServer((host, port), _SSEHandler)
+    server.daemon_threads = True
+    print(f"[feed] SSE 变更流已启动：http://{host}:{port}/changes?since=0")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -3,12 +3,15 @@ from __future__ import annotations
 import json
 from typing import Any, Dict, List
 
+from pydantic import model_validator
+
 from engine.config import load_config
 from engine.context import load_world_state, get_recent_logs
 from engine.llm_executor import call_llm_structured
-from engine.schemas import SpaceUpdate
+from engine.schemas import SpaceUpdate, FieldChange
 from engine.apply_diff import apply_space_update
 from engine.store import dump_json, append_jsonl
+from engine.change_feed import publish
 
 def _filter_space_logs(space_id: str, logs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """从最近日志中筛选与该空间相关的部分（简单规则版）。"""
@@ -24,6 +27,16 @@ def _filter_space_logs(space_id: str, logs: List[Dict[str, Any]]) -> List[Dict[s
                 filtered.append(rec)
     return filtered
 
+def _space_update_for(space_id: str):
+    """SpaceUpdate 的派生 schema：要求 space_id 与坍缩空间一致，否则校验失败、重试且不缓存。"""
+    class CollapseUpdate(SpaceUpdate):
+        @model_validator(mode="after")
+        def _same_space(self):
+            if self.space_id != space_id:
+                raise ValueError(f"space_id mismatch: expected {space_id}, got {self.space_id}")
+            return self
+    return CollapseUpdate
+
 def run_collapse(space_id: str):
     """
     玩家进入某空间：
@@ -64,7 +77,7 @@ def run_collapse(space_id: str):
     # 调用 LLM，解析为 SpaceUpdate
     upd = call_llm_structured(
         prompt=prompt,
-        schema_model=SpaceUpdate,
+        schema_model=_space_update_for(space_id),
         model=cfg.model,
         temperature=cfg.temperature,
         max_tokens=cfg.max_tokens,
@@ -72,14 +85,17 @@ def run_collapse(space_id: str):
     )
 
     # 应用更新到 world
-    apply_space_update(world, upd)
+    changes = apply_space_update(world, upd)
 
     # 标记该空间为 frozen（不再参与潜在更新）
     space = world[space_id]
+    if not space.get("frozen", False):
+        changes.append(FieldChange(field="frozen", before=space.get("frozen"), after=True))
     space["frozen"] = True
 
     # 写回 world.json
     dump_json("data/world.json", world)
+    publish("collapse", "world", space_id, changes, "collapse")
 
     # 记录日志
     append_jsonl("data/world_log.jsonl", {
@@ -26,6 +26,12 @@ class Config:
     def max_updates_per_collapse(self) -> int: return int(self.raw.get("max_updates_per_collapse", 1))
     @property
     def init(self) -> Dict[str, Any]: return self.raw.get("init", {})
+    @property
+    def init_chunk_size(self) -> int: return max(1, int(self.init.get("chunk_size", 20)))
+    @property
+    def init_workers(self) -> int: return max(1, int(self.init.get("workers", 64)))
+    @property
+    def init_max_tokens(self) -> int: return int(self.init.get("max_tokens", 3000))
 
 def load_config(path: str = "config.yaml") -> Config:
     with open(path, "r", encoding="utf-8") as f:
@@ -12,6 +12,7 @@ from engine.llm_executor import call_llm_structured
 from engine.schemas import NpcUpdate
 from engine.apply_diff import apply_npc_update
 from engine.store import dump_json, append_jsonl
+from engine.change_feed import publish
 
 class DialogResponse(BaseModel):
     npc_update: NpcUpdate
@@ -113,8 +114,9 @@ def run_dialog(npc_id: str, player_input: str) -> str:
     entities = ctx["entities"]
     events = ctx["events"]
 
-    apply_npc_update(entities, resp.npc_update)
+    changes = apply_npc_update(entities, resp.npc_update)
     dump_json("data/entities.json", entities)
+    publish("npc_update", "entities", resp.npc_update.npc_id, changes, "dialog")
 
     # 记录对话日志
     append_jsonl("data/world_log.jsonl", {
@@ -1,11 +1,15 @@
 # engine/init_world.py
 from __future__ import annotations
-import json, os
-from typing import Dict, Any, List
-from pydantic import BaseModel
+import json, os, math, hashlib, shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Tuple
+from pydantic import BaseModel, Field, model_validator
 from engine.config import load_config
 from engine.llm_executor import call_llm_structured
-from engine.store import dump_json, append_jsonl
+from engine.store import load_json, dump_json, append_jsonl
+from engine.change_feed import publish_reset
+
+PARTS_DIR = "data/init_parts"
 
 # 轻量校验容器
 class InitTriplet(BaseModel):
@@ -13,22 +17,260 @@ class InitTriplet(BaseModel):
     entities: Dict[str, Any]
     events: List[Dict[str, Any]]
 
-def run_init():
-    cfg = load_config()
-    with open("prompts/init_world.txt","r",encoding="utf-8") as f:
-        template = f.read()
-    prompt = template.replace("{{CONFIG}}", json.dumps(cfg.init, ensure_ascii=False))
+# 分块校验容器：每次 LLM 调用只负责一小批空间或 NPC
+class SpaceDetail(BaseModel):
+    id: str
+    visible_state: str = Field(min_length=1, max_length=60)
+    latent_state: List[str] = []
+    importance_bonus: int = Field(0, ge=0, le=1)
+
+class EventSeed(BaseModel):
+    id: str
+    scope_spaces: List[str] = []
+    trigger_probability: float = Field(ge=0.0, le=1.0)
+    possible_outcomes: List[str] = []
+
+class SpaceChunk(BaseModel):
+    spaces: List[SpaceDetail]
+    events: List[EventSeed] = []
+
+class NpcDetail(BaseModel):
+    id: str
+    description: str = Field(min_length=1, max_length=80)
+    memory: List[str] = []
+    latent_state: List[str] = []
+
+class NpcChunk(BaseModel):
+    npcs: List[NpcDetail]
+
+def _space_ids(init: Dict[str, Any]) -> List[str]:
+    spaces = init.get("spaces", [])
+    # 支持直接给数量：spaces: 1000 -> space_0001 ... space_1000
+    if isinstance(spaces, int):
+        width = max(4, len(str(spaces)))
+        return [f"space_{i:0{width}d}" for i in range(1, spaces + 1)]
+    return [str(s) for s in spaces]
+
+def _build_skeleton(init: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    不调用 LLM，按配置确定性地生成世界骨架：
+    - world：空间 id、网格坐标、状态、按 importance_rules 计算的重要度
+    - entities：NPC id（role_序号）、角色、轮转分配的位置、重要度
+    文本字段（visible_state / description 等）留空，由后续分块调用补全。
+    """
+    rules = init.get("importance_rules", {})
+    space_default = int(rules.get("space_default", 2))
+    npc_default = int(rules.get("npc_default", 2))
+    role_bonus = rules.get("role_bonus", {}) or {}
+
+    space_ids = _space_ids(init)
+    cols = max(1, math.ceil(math.sqrt(len(space_ids))))
+    world: Dict[str, Any] = {}
+    for i, sid in enumerate(space_ids):
+        world[sid] = {
+            "id": sid,
+            "position": [i % cols, i // cols],
+            "status": "latent",
+            "importance": _clip_importance(space_default),
+            "visible_state": "",
+            "latent_state": [],
+        }
+
+    entities: Dict[str, Any] = {}
+    k = 0
+    for role, count in (init.get("npcs", {}) or {}).items():
+        for j in range(1, int(count) + 1):
+            nid = f"{role}_{j}"
+            entities[nid] = {
+                "id": nid,
+                "role": role,
+                "location": space_ids[k % len(space_ids)] if space_ids else "unknown",
+                "description": "",
+                "importance": _clip_importance(npc_default + int(role_bonus.get(role, 0))),
+                "memory": [],
+                "latent_state": [],
+            }
+            k += 1
+    return world, entities
+
+def _clip_importance(x: int) -> int:
+    return max(1, min(3, x))
+
+def _enforce_importance_ratio(items: Dict[str, Any], ratio: float,
+                              rule_top: List[str]) -> List[str]:
+    """
+    3级占比超过上限时降级多出的部分为 2，返回被降级的 id。
+    优先保留规则给出的 3 级（rule_top，如 role_bonus），其次才是 LLM importance_bonus 提上来的。
+    """
+    rule_set = set(rule_top)
+    top = sorted((k for k, v in items.items() if v.get("importance") == 3),
+                 key=lambda k: (k not in rule_set, k))
+    allowed = int(len(items) * ratio)
+    demoted = top[allowed:]
+    for k in demoted:
+        items[k]["importance"] = 2
+    return demoted
+
+def _chunks(ids: List[str], size: int) -> List[List[str]]:
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+def _covering(schema_model, field: str, chunk_ids: List[str]):
+    """
+    派生一个带 id 覆盖校验的分块 schema：输出必须恰好覆盖 chunk_ids（不缺、不多、不重复）。
+    校验失败即 ValidationError，由 call_llm_structured 的 tenacity 重试，且不会写入缓存。
+    """
+    expected = set(chunk_ids)
+
+    class Checked(schema_model):
+        @model_validator(mode="after")
+        def _cover_ids(self):
+            got = [d.id for d in getattr(self, field)]
+            missing = sorted(expected - set(got))
+            extra = sorted(set(got) - expected)
+            if missing or extra or len(got) != len(set(got)):
+                raise ValueError(f"{field} ids mismatch: missing={missing} extra={extra}")
+            return self
 
+    Checked.__name__ = schema_model.__name__
+    return Checked
+
+def _part_path(cfg, template: str, kind: str, idx: int, payload: Any) -> str:
+    # 文件名带上分块内容、模板、世界类型、模型的哈希：任一变化后旧断点自动失效
+    material = {
+        "payload": payload,
+        "template": template,
+        "world_type": cfg.init.get("world_type", ""),
+        "model": cfg.model,
+    }
+    digest = hashlib.sha256(json.dumps(material, ensure_ascii=False, sort_keys=True)
+                            .encode("utf-8")).hexdigest()[:10]
+    return f"{PARTS_DIR}/{kind}_{idx:04d}_{digest}.json"
+
+def _run_chunk(cfg, template: str, schema_model, kind: str, idx: int,
+               chunk_ids: List[str], payload: Dict[str, Any]):
+    """执行一个分块：已有合法断点则直接读取，否则调用 LLM，校验通过后落盘。"""
+    schema_model = _covering(schema_model, kind, chunk_ids)
+    path = _part_path(cfg, template, kind, idx, payload)
+    if os.path.exists(path):
+        try:
+            return schema_model.model_validate(load_json(path))
+        except ValueError:
+            pass  # 断点内容不合法：重新生成
+
+    prompt = (
+        template
+        .replace("{{WORLD_TYPE}}", str(cfg.init.get("world_type", "")))
+        .replace("{{CHUNK_JSON}}", json.dumps(payload, ensure_ascii=False, indent=2))
+    )
     obj = call_llm_structured(
         prompt=prompt,
-        schema_model=InitTriplet,
-        model=cfg.model, temperature=cfg.temperature, max_tokens=cfg.max_tokens,
-        cache_key="init_world"
+        schema_model=schema_model,
+        model=cfg.model, temperature=cfg.temperature, max_tokens=cfg.init_max_tokens,
+        cache_key=f"init_{kind}::{idx}"
     )
+    dump_json(path, obj.model_dump())
+    return obj
+
+def _merge_spaces(world: Dict[str, Any], events: Dict[str, Dict[str, Any]],
+                  idx: int, chunk_ids: List[str], chunk: SpaceChunk):
+    for d in chunk.spaces:
+        space = world[d.id]
+        space["visible_state"] = d.visible_state
+        space["latent_state"] = list(d.latent_state)
+        space["importance"] = _clip_importance(space["importance"] + d.importance_bonus)
+    for ev in chunk.events:
+        # 各分块独立生成，事件 id 会重复（如 ev_1），按分块加前缀区分
+        eid = f"spaces{idx}_{ev.id}"
+        scope = [s for s in ev.scope_spaces if s in chunk_ids]
+        if not scope or eid in events:
+            continue
+        events[eid] = {
+            "id": eid,
+            "scope_spaces": scope,
+            "trigger_probability": ev.trigger_probability,
+            "possible_outcomes": ev.possible_outcomes,
+            "latency": True,
+        }
+
+def _merge_npcs(entities: Dict[str, Any], chunk_ids: List[str], chunk: NpcChunk):
+    for d in chunk.npcs:
+        npc = entities[d.id]
+        npc["description"] = d.description
+        npc["memory"] = list(d.memory)
+        npc["latent_state"] = list(d.latent_state)
+
+def run_init():
+    """
+    分阶段初始化世界：
+    1. 按 config.init 确定性生成空间列表与 NPC 骨架
+    2. 空间细节、NPC 细节分块并行调用 LLM，每块单独校验并落盘（可断点续跑）
+    3. 本地合并，按 importance_rules / max_importance3_ratio 修正重要度
+    """
+    cfg = load_config()
+    with open("prompts/init_spaces.txt","r",encoding="utf-8") as f:
+        space_template = f.read()
+    with open("prompts/init_npcs.txt","r",encoding="utf-8") as f:
+        npc_template = f.read()
+
+    world, entities = _build_skeleton(cfg.init)
+    # 记下规则本身给出的 3 级，比例超限时优先保留
+    rule_top_spaces = [k for k, v in world.items() if v["importance"] == 3]
+    rule_top_npcs = [k for k, v in entities.items() if v["importance"] == 3]
+    size = cfg.init_chunk_size
+
+    jobs = []
+    for i, ids in enumerate(_chunks(list(world), size)):
+        payload = {"spaces": [{k: world[s][k] for k in ("id", "position", "importance")}
+                              for s in ids]}
+        jobs.append(("spaces", i, ids, payload, space_template, SpaceChunk))
+    for i, ids in enumerate(_chunks(list(entities), size)):
+        payload = {"npcs": [{k: entities[n][k] for k in ("id", "role", "location")}
+                            for n in ids]}
+        jobs.append(("npcs", i, ids, payload, npc_template, NpcChunk))
+
+    os.makedirs(PARTS_DIR, exist_ok=True)
+    results: Dict[Tuple[str, int], Any] = {}
+    failed: List[str] = []
+    # 并发数随分块数伸缩（以 workers 为上限），大世界尽量一轮完成
+    workers = max(1, min(len(jobs), cfg.init_workers))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_run_chunk, cfg, tpl, model, kind, i, ids, payload): (kind, i)
+            for kind, i, ids, payload, tpl, model in jobs
+        }
+        for fut in as_completed(futures):
+            kind, i = futures[fut]
+            try:
+                results[(kind, i)] = fut.result()
+            except Exception as e:
+                failed.append(f"{kind}#{i}: {e}")
+    if failed:
+        raise RuntimeError(
+            f"{len(failed)}/{len(jobs)} 个分块生成失败，重新运行 init 将从断点继续：\n"
+            + "\n".join(failed)
+        )
+
+    events: Dict[str, Dict[str, Any]] = {}
+    for kind, i, ids, _, _, _ in jobs:
+        if kind == "spaces":
+            _merge_spaces(world, events, i, ids, results[(kind, i)])
+        else:
+            _merge_npcs(entities, ids, results[(kind, i)])
+
+    ratio = float(cfg.init.get("limits", {}).get("max_importance3_ratio", 1.0))
+    demoted = (_enforce_importance_ratio(world, ratio, rule_top_spaces)
+               + _enforce_importance_ratio(entities, ratio, rule_top_npcs))
+    if demoted:
+        print(f"[init] 3级占比超过 {ratio:.0%}，已降为 2：{', '.join(demoted)}")
+
+    obj = InitTriplet(world=world, entities=entities, events=list(events.values()))
 
-    os.makedirs("data", exist_ok=True)
     dump_json("data/world.json", obj.world)
     dump_json("data/entities.json", obj.entities)
     dump_json("data/events.json", obj.events)
-    append_jsonl("data/world_log.jsonl", {"t":0, "event":"init", "player_location": cfg.init.get("start","unknown")})
-    print("[OK] 初始化完成：data/world.json, entities.json, events.json 已生成。")
+    publish_reset(obj.world, obj.entities, obj.events, source="init")
+    shutil.rmtree(PARTS_DIR, ignore_errors=True)
+    append_jsonl("data/world_log.jsonl", {"t":0, "event":"init", "player_location": cfg.init.get("start","unknown"),
+                                         "spaces": len(obj.world), "npcs": len(obj.entities),
+                                         "chunks": len(jobs), "importance_demoted": demoted})
+    print(f"[OK] 初始化完成（{len(jobs)} 个分块）：data/world.json, entities.json, events.json 已生成。")
@@ -34,3 +34,17 @@ Update = Union[SpaceUpdate, NpcUpdate, EventProposal]
 
 class UpdateList(BaseModel):
     updates: List[Update]
+
+class FieldChange(BaseModel):
+    field: str
+    before: Any = None
+    after: Any = None
+
+class ChangeSet(BaseModel):
+    version: int
+    source: str
+    type: Literal["space_update", "npc_update", "event_proposal", "collapse", "reset"]
+    target: Literal["world", "entities", "events", "all"]
+    target_id: str
+    changes: List[FieldChange]
+    ts: float
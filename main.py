@@ -5,6 +5,7 @@ from engine.init_world import run_init
 from engine.latent_update import run_latent_tick
 from engine.collapse import run_collapse
 from engine.dialog import run_dialog
+from engine.change_feed import iter_changes, serve_changes
 
 def cmd_show_config():
     cfg = load_config()
@@ -14,9 +15,10 @@ def cmd_show_config():
 
 if __name__ == "__main__":
     p = argparse.ArgumentParser("PDWM v1")
-    p.add_argument("cmd", choices=["show-config","init","tick","enter","talk"])
-    p.add_argument("arg", nargs="?", help="space_id for enter, npc_id for talk")
+    p.add_argument("cmd", choices=["show-config","init","tick","enter","talk","changes","serve"])
+    p.add_argument("arg", nargs="?", help="space_id for enter, npc_id for talk, since-version for changes, port for serve")
     p.add_argument("rest", nargs="*", help="player utterance for talk")
+    p.add_argument("--follow", action="store_true", help="changes: keep waiting for new versions")
     args = p.parse_args()
 
     if args.cmd == "show-config":
@@ -41,3 +43,23 @@ if __name__ == "__main__":
             npc_id = args.arg
             player_input = " ".join(args.rest)
             run_dialog(npc_id, player_input)
+
+    elif args.cmd == "changes":
+        try:
+            since = int(args.arg) if args.arg else 0
+        except ValueError:
+            print("用法: python main.py changes [since_version] [--follow]")
+            raise SystemExit(2)
+        try:
+            for cs in iter_changes(since, follow=args.follow):
+                print(cs.model_dump_json(), flush=True)
+        except KeyboardInterrupt:
+            pass
+
+    elif args.cmd == "serve":
+        try:
+            port = int(args.arg) if args.arg else 8765
+        except ValueError:
+            print("用法: python main.py serve [port]")
+            raise SystemExit(2)
+        serve_changes(port=port)